@@ -1,7 +1,11 @@
 # app.py
 import streamlit as st
-import requests
+import httpx
 import json
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # ------------------------------------------
 # CONFIG
@@ -14,10 +18,17 @@ st.set_page_config(page_title="YouTube Research Agent", layout="wide")
 # ------------------------------------------
 # Backend helpers
 # ------------------------------------------
+def _http() -> httpx.Client:
+    """One keep-alive HTTP/2 client per session → TCP/TLS reused across calls"""
+    if "http" not in st.session_state:
+        st.session_state.http = httpx.Client(http2=True, timeout=200, base_url=API_BASE)
+    return st.session_state.http
+
+
 def call_backend(query: str):
     """Calls /query endpoint"""
     try:
-        resp = requests.post(f"{API_BASE}/query", json={"query": query}, timeout=200)
+        resp = _http().post("/query", json={"query": query})
         if resp.status_code != 200:
             st.error(f"Backend Error {resp.status_code}: {resp.text}")
             return None
@@ -30,11 +41,7 @@ def call_backend(query: str):
 def export_from_backend(payload: dict, fmt="html"):
     """Calls /export endpoint and returns raw bytes"""
     try:
-        resp = requests.post(
-            f"{API_BASE}/export?format={fmt}",
-            json=payload,
-            timeout=200
-        )
+        resp = _http().post("/export", params={"format": fmt}, json=payload)
         if resp.status_code == 200:
             return resp.content
         else:
@@ -45,6 +52,30 @@ def export_from_backend(payload: dict, fmt="html"):
         return None
 
 
+def export_all_from_backend(payload: dict):
+    """
+    Calls /export_all once → {"html", "txt", "docx"} bytes.
+    None only when the backend has no such endpoint (caller falls back to /export);
+    any other failure is reported and gives {} (no downloads, no retries).
+    """
+    try:
+        resp = _http().post("/export_all", json=payload)
+        if resp.status_code in (404, 405):
+            return None
+        if resp.status_code != 200:
+            st.error(f"Export failed ({resp.status_code}): {resp.text}")
+            return {}
+        data = resp.json()
+        return {
+            "html": data["html"].encode("utf-8"),
+            "txt": data["txt"].encode("utf-8"),
+            "docx": base64.b64decode(data["docx"]),
+        }
+    except Exception as e:
+        st.error(f"Export request failed: {str(e)}")
+        return {}
+
+
 # ------------------------------------------------------
 # UI
 # ------------------------------------------------------
@@ -112,6 +143,8 @@ if run_btn:
     st.subheader("🧠 AI Channel Analysis")
 
     report = analysis.get("report") if isinstance(analysis, dict) else analysis
+    if report is None and isinstance(analysis, dict):
+        report = analysis.get("raw")
 
     if isinstance(report, dict):
         st.write("### Executive Summary")
@@ -159,10 +192,22 @@ if run_btn:
         "analysis": analysis
     }
 
-    # Fetch all export formats in advance
-    html_bytes = export_from_backend(export_payload, "html")
-    txt_bytes = export_from_backend(export_payload, "txt")
-    docx_bytes = export_from_backend(export_payload, "docx")
+    # Fetch all export formats in advance: one /export_all call
+    exports = export_all_from_backend(export_payload)
+    if exports is not None:
+        html_bytes, txt_bytes, docx_bytes = exports.get("html"), exports.get("txt"), exports.get("docx")
+    else:
+        # older backend without /export_all → per-format calls in parallel
+        # (worker threads get the script context so st.error() inside the helper still renders)
+        ctx = get_script_run_ctx()
+        with ThreadPoolExecutor(
+            max_workers=3,
+            initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx),
+        ) as ex:
+            futs = {f: ex.submit(export_from_backend, export_payload, f) for f in ("html", "txt", "docx")}
+            html_bytes = futs["html"].result()
+            txt_bytes = futs["txt"].result()
+            docx_bytes = futs["docx"].result()
 
     colA, colB, colC = st.columns(3)
 
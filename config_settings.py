@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -5,6 +6,15 @@ class Settings(BaseSettings):
     groq_api_key: str
     groq_model: str = "llama-3.1-8b-instant"
     sentence_transformers_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    # "fastembed-onnx-int8" → int8-quantized ONNX graph on CPU (ignores sentence_transformers_model)
+    embedding_backend: Literal["fastembed", "fastembed-onnx-int8"] = "fastembed"
+
+    # HNSW index (M / ef_construction fixed at build time, ef_search tunable)
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 64
+    hnsw_ef_search: int = 40
+    # "faiss-fp16" / "faiss-sq8" → HNSW over scalar-quantized vectors (needs faiss-cpu)
+    vector_index: Literal["hnswlib", "faiss-fp16", "faiss-sq8"] = "hnswlib"
 
     class Config:
         env_file = ".env"
@@ -1,4 +1,5 @@
 -- enable pgvector extension (requires Postgres admin)
+-- requires pgvector >= 0.7.0 for halfvec (fp16 embeddings, half the bytes per row)
 CREATE EXTENSION IF NOT EXISTS vector;
 
 -- main table for video embeddings
@@ -8,11 +9,24 @@ CREATE TABLE IF NOT EXISTS video_embeddings (
   title TEXT,
   description TEXT,
   published_at TIMESTAMP,
-  embedding vector(384),
+  embedding halfvec(384),
   metadata jsonb
 );
 
--- recommended ANN index (ivfflat). Tune lists value for dataset size.
--- Note: create index AFTER inserting some rows (ivfflat needs to be trained)
+-- recommended ANN index (hnsw). No training step, so it is
+-- safe to create on an empty table. m / ef_construction match the in-process
+-- HNSW defaults (hnsw_m / hnsw_ef_construction in config_settings).
 CREATE INDEX IF NOT EXISTS video_embeddings_embedding_idx ON video_embeddings
-USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+USING hnsw (embedding halfvec_cosine_ops) WITH (m = 16, ef_construction = 64);
+
+-- inserts: cast float vectors on the way in, e.g. VALUES (..., $1::halfvec, ...);
+-- query vectors can be passed the same way: ORDER BY embedding <=> $1::halfvec
+
+-- query-time beam width; run per connection/session before searching:
+-- SET hnsw.ef_search = 40;
+
+-- alternative: ivfflat (faster build, lower recall/QPS). Tune lists for dataset size.
+-- Note: create it AFTER inserting rows (ivfflat needs to be trained), and drop
+-- the hnsw index above first since both use the same name.
+-- CREATE INDEX IF NOT EXISTS video_embeddings_embedding_idx ON video_embeddings
+-- USING ivfflat (embedding halfvec_cosine_ops) WITH (lists = 100);
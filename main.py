@@ -1,14 +1,15 @@
 # main.py
 import asyncio
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
-from utils_helpers import extract_channel_from_text
+from utils_helpers import extract_channel_from_text, clean_llm_output, close_session
 from services_youtube_client import YouTubeAPIService
 from orchestrators_master import MasterOrchestrator
-from services_llm_service import get_llm_service
+from services_llm_service import get_llm_service, aclose as close_llm_client
 from services_embedding_service import get_embedding_service
+from services_vector_store import get_vector_store
 from utils_logger import get_logger
 from config_settings import settings
 
@@ -35,9 +36,24 @@ async def startup_event():
     logger.info(f"LLM Test: {ok}")
 
     # init embedding (fastembed)
-    get_embedding_service({"model": settings.sentence_transformers_model})
+    get_embedding_service({
+        "model": settings.sentence_transformers_model,
+        "backend": settings.embedding_backend,
+    })
     logger.info("Embeddings loaded.")
 
+    # HNSW store: built here; ef_search is re-tuned by add_batch as it grows
+    get_vector_store()
+
+    # shared per-process instances (reused by every /query)
+    app.state.yt = YouTubeAPIService()
+    app.state.orchestrator = MasterOrchestrator()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_session()
+    await close_llm_client()
+
 @app.get("/")
 def root():
     return {"status": "ok", "mode": "FULL_HNSW_METADATA"}
@@ -49,132 +65,174 @@ class QueryModel(BaseModel):
 # main.py or export_route.py
 # Add imports at top of main.py
 import json
+import orjson
+import base64
+import hashlib
+import html as html_lib
 from io import BytesIO
-from fastapi.responses import HTMLResponse, PlainTextResponse, Response
-from docx import Document
-
-# ---------------------------------------------------------
-# Helper: clean LLM output (remove ```json)
-# ---------------------------------------------------------
-def clean_llm_output(raw: str):
-    if not raw:
-        return raw
-    raw = raw.replace("```json", "")
-    raw = raw.replace("```", "")
-    raw = raw.strip()
-    return raw
-
+from typing import List, Literal, Tuple
+from cachetools import LRUCache
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 
 # ---------------------------------------------------------
-# Helper: Convert JSON report → nice readable text
+# Helper: Convert JSON report → list of (kind, text) blocks
+# kind: "h" (heading), "p" (paragraph), "li" (bullet item)
+# Consumed directly by the TXT / HTML / DOCX renderers.
 # ---------------------------------------------------------
-def json_to_text(report: dict) -> str:
-    lines = []
+def build_report_blocks(report: dict) -> List[Tuple[Literal["h", "p", "li"], str]]:
+    blocks = []
+    add = blocks.append
 
     # ---------------------------------------------------------
     # 1. Automatic Channel Analysis (High-level overview)
     # ---------------------------------------------------------
-    lines.append("AUTOMATIC CHANNEL ANALYSIS")
-    lines.append("This report provides a structured overview of the channel based on metadata, semantic patterns, and video insights.")
-    lines.append("")
+    add(("h", "AUTOMATIC CHANNEL ANALYSIS"))
+    add(("p", "This report provides a structured overview of the channel based on metadata, semantic patterns, and video insights."))
 
     # Executive Summary
     if "executive_summary" in report:
-        lines.append("EXECUTIVE SUMMARY")
-        lines.append(report["executive_summary"])
-        lines.append("")
+        add(("h", "EXECUTIVE SUMMARY"))
+        add(("p", str(report["executive_summary"])))
 
     # ---------------------------------------------------------
     # 2. Content Themes
     # ---------------------------------------------------------
     if "themes" in report:
-        lines.append("CONTENT THEMES")
+        add(("h", "CONTENT THEMES"))
         for t in report["themes"]:
             if isinstance(t, str):
-                lines.append(f" • {t}")
+                add(("li", t))
             elif isinstance(t, dict):
-                lines.append(f" • {t.get('name','')} ({t.get('engagement','')})")
-        lines.append("")
+                add(("li", f"{t.get('name','')} ({t.get('engagement','')})"))
 
     # ---------------------------------------------------------
     # 3. Engagement Metrics
     # ---------------------------------------------------------
     metrics = report.get("metrics", {})
     if metrics:
-        lines.append("ENGAGEMENT METRICS")
-        lines.append(f" • Subscribers: {metrics.get('subscriber_count','Not Available')}")
-        lines.append(f" • Total Views: {metrics.get('total_views','Not Available')}")
-        lines.append(f" • Total Videos: {metrics.get('total_videos','Not Available')}")
-        lines.append(f" • Average Views: {metrics.get('average_views','Not Available')}")
-        lines.append(f" • Engagement Rate: {metrics.get('engagement_rate','Not Available')}")
-        lines.append("")
+        add(("h", "ENGAGEMENT METRICS"))
+        add(("li", f"Subscribers: {metrics.get('subscriber_count','Not Available')}"))
+        add(("li", f"Total Views: {metrics.get('total_views','Not Available')}"))
+        add(("li", f"Total Videos: {metrics.get('total_videos','Not Available')}"))
+        add(("li", f"Average Views: {metrics.get('average_views','Not Available')}"))
+        add(("li", f"Engagement Rate: {metrics.get('engagement_rate','Not Available')}"))
 
     # ---------------------------------------------------------
     # 4. Trending Topics
     # ---------------------------------------------------------
     if "trends" in report:
-        lines.append("TRENDING TOPICS")
+        add(("h", "TRENDING TOPICS"))
         for key, value in report["trends"].items():
-            lines.append(f" • {key}: {value}")
-        lines.append("")
+            add(("li", f"{key}: {value}"))
 
     # ---------------------------------------------------------
     # 5. Top Recommendations
     # ---------------------------------------------------------
     if "top_recommendations" in report:
-        lines.append("RECOMMENDATIONS")
+        add(("h", "RECOMMENDATIONS"))
         for r in report["top_recommendations"]:
-            lines.append(f" • {r['title']} (Priority {r['priority']})")
-        lines.append("")
+            add(("li", f"{r['title']} (Priority {r['priority']})"))
 
     # ---------------------------------------------------------
     # 6. Actionable Tips
     # ---------------------------------------------------------
     if "short_actionable_tips" in report:
-        lines.append("ACTIONABLE TIPS")
+        add(("h", "ACTIONABLE TIPS"))
         for tip in report["short_actionable_tips"]:
-            lines.append(f" • {tip}")
-        lines.append("")
+            add(("li", str(tip)))
 
-    # ---------------------------------------------------------
-    # 7. Raw JSON (Optional for debugging)
-    # ---------------------------------------------------------
-    # lines.append("")
-    # lines.append("RAW JSON (debug only):")
-    # lines.append(json.dumps(report, indent=2))
+    return blocks
 
+
+def blocks_to_text(blocks) -> str:
+    lines = []
+    for kind, text in blocks:
+        if kind == "h":
+            if lines:
+                lines.append("")
+            lines.append(text)
+        elif kind == "li":
+            lines.append(f" • {text}")
+        else:
+            lines.append(text)
+    lines.append("")
     return "\n".join(lines)
 
 
-@app.post("/export")
-async def export(payload: dict, format: str = "html"):
-    from io import BytesIO
-    import json
-    from fastapi.responses import HTMLResponse, PlainTextResponse, Response
-    from docx import Document
-    from docx.shared import RGBColor
+# ---------------------------------------------------------
+# Helper: Convert JSON report → nice readable text
+# ---------------------------------------------------------
+def json_to_text(report: dict) -> str:
+    return blocks_to_text(build_report_blocks(report))
+
+
+# ---------------------------------------------------------
+# Export helpers (shared by /export and /export_all)
+# ---------------------------------------------------------
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+# rendered blocks / text / HTML memoized by report hash (cleared on process restart)
+_render_cache = LRUCache(maxsize=768)
+
 
+def _report_key(title: str, report) -> str:
+    blob = json.dumps([title, report], sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+
+def _cached(key: str, kind: str, build):
+    value = _render_cache.get((key, kind))
+    if value is None:
+        value = _render_cache[(key, kind)] = build()
+    return value
+
+
+def _prepare_export(payload: dict):
+    """Parse the report once → (title, blocks, cache key)."""
     analysis = payload.get("analysis", {})
-    raw_report = analysis.get("report", {})
+    raw_report = analysis.get("report")
+    if raw_report is None:
+        # /query couldn't parse the LLM output → fall back to the raw text
+        raw_report = analysis.get("raw", {})
 
-    # Convert to dict if raw JSON text
+    # Convert to dict if raw JSON text (already-parsed reports skip this)
     if isinstance(raw_report, str):
         raw_report = clean_llm_output(raw_report)
         try:
-            raw_report = json.loads(raw_report)
+            raw_report = orjson.loads(raw_report)
         except:
             raw_report = {"executive_summary": raw_report}
 
-    text_report = json_to_text(raw_report)
-
     channel = payload.get("channel", {})
     title = channel.get("snippet", {}).get("title", "YouTube Report")
 
-    # ---------------------------------------------------------
-    # HTML EXPORT (styled)
-    # ---------------------------------------------------------
-    if format == "html":
-        html = f"""
+    key = _report_key(title, raw_report)
+    blocks = _cached(key, "blocks", lambda: build_report_blocks(raw_report))
+    return title, blocks, key
+
+
+def _build_html(title: str, blocks) -> str:
+    esc = html_lib.escape
+    title = esc(title)
+    body = []
+    in_list = False
+    for kind, text in blocks:
+        if kind == "li":
+            if not in_list:
+                body.append("<ul>")
+                in_list = True
+            body.append(f"<li>{esc(text)}</li>")
+            continue
+        if in_list:
+            body.append("</ul>")
+            in_list = False
+        body.append(f"<h2>{esc(text)}</h2>" if kind == "h" else f"<p>{esc(text)}</p>")
+    if in_list:
+        body.append("</ul>")
+    body_html = "\n".join(body)
+
+    return f"""
         <html>
         <head>
             <meta charset="utf-8"/>
@@ -183,23 +241,61 @@ async def export(payload: dict, format: str = "html"):
                 body {{ font-family: Arial, sans-serif; line-height: 1.6; }}
                 h1 {{ color: #1E88E5; }}
                 h2 {{ color: #1976D2; margin-top: 20px; }}
-                pre {{ white-space: pre-wrap; }}
+                p {{ white-space: pre-wrap; }}
             </style>
         </head>
         <body>
             <h1>{title}</h1>
-            <pre>{text_report}</pre>
+            {body_html}
         </body>
         </html>
         """
-        return HTMLResponse(content=html, media_type="text/html")
+
+
+def _build_docx(title: str, blocks) -> bytes:
+    # python-docx is only loaded once a DOCX is actually requested
+    from docx import Document
+    from docx.shared import RGBColor
+
+    doc = Document()
+    h = doc.add_heading(title, level=1)
+    h.runs[0].font.color.rgb = RGBColor(0, 102, 204)
+
+    for kind, text in blocks:
+        if kind == "h":
+            p = doc.add_paragraph()
+            run = p.add_run(text)
+            run.bold = True
+            run.font.color.rgb = RGBColor(0, 102, 204)
+        elif kind == "li":
+            doc.add_paragraph(text, style="List Bullet")
+        else:
+            doc.add_paragraph(text)
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+@app.post("/export")
+async def export(payload: dict, format: str = "html"):
+    title, blocks, key = _prepare_export(payload)
+
+    # ---------------------------------------------------------
+    # HTML EXPORT (styled)
+    # ---------------------------------------------------------
+    if format == "html":
+        return HTMLResponse(
+            content=_cached(key, "html", lambda: _build_html(title, blocks)),
+            media_type="text/html"
+        )
 
     # ---------------------------------------------------------
     # TXT EXPORT
     # ---------------------------------------------------------
     if format == "txt":
         return PlainTextResponse(
-            content=text_report,
+            content=_cached(key, "txt", lambda: blocks_to_text(blocks)),
             media_type="text/plain"
         )
 
@@ -207,33 +303,33 @@ async def export(payload: dict, format: str = "html"):
     # DOCX EXPORT (with blue headings)
     # ---------------------------------------------------------
     if format == "docx":
-        doc = Document()
-        h = doc.add_heading(title, level=1)
-        h.runs[0].font.color.rgb = RGBColor(0, 102, 204)
-
-        for line in text_report.split("\n"):
-            if line.endswith(":"):  # headings
-                p = doc.add_paragraph()
-                run = p.add_run(line)
-                run.bold = True
-                run.font.color.rgb = RGBColor(0, 102, 204)
-            else:
-                doc.add_paragraph(line)
-
-        buffer = BytesIO()
-        doc.save(buffer)
-        buffer.seek(0)
-
-        return Response(
-            content=buffer.read(),
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        # python-docx build + save is CPU-bound → keep it off the event loop
+        content = await asyncio.to_thread(_build_docx, title, blocks)
+        return StreamingResponse(
+            iter([content]),
+            media_type=DOCX_MEDIA_TYPE,
             headers={"Content-Disposition": f"attachment; filename={title}.docx"}
         )
 
 
+# ---------------------------------------------------------
+# All formats in one round trip (report parsed/rendered once)
+# ---------------------------------------------------------
+@app.post("/export_all")
+async def export_all(payload: dict):
+    title, blocks, key = _prepare_export(payload)
+    docx_bytes = await asyncio.to_thread(_build_docx, title, blocks)
+    return JSONResponse({
+        "title": title,
+        "html": _cached(key, "html", lambda: _build_html(title, blocks)),
+        "txt": _cached(key, "txt", lambda: blocks_to_text(blocks)),
+        "docx": base64.b64encode(docx_bytes).decode("ascii"),
+    })
+
+
 
 @app.post("/query")
-async def process_query(body: QueryModel):
+async def process_query(body: QueryModel, request: Request):
     user_query = (body.query or "").strip()
     logger.info(f"User query: {user_query}")
 
@@ -244,20 +340,24 @@ async def process_query(body: QueryModel):
     logger.info(f"Resolving channel: {channel_lookup}")
 
     try:
-        yt = YouTubeAPIService()
-        orchestrator = MasterOrchestrator()
+        yt = request.app.state.yt
+        orchestrator = request.app.state.orchestrator
 
-        channel = yt.get_channel_by_name_or_handle(channel_lookup)
+        channel = await yt.get_channel_by_name_or_handle(channel_lookup)
         if not channel:
             raise HTTPException(404, "Channel not found")
 
         channel_id = channel.get("id")
-        videos = yt.get_channel_videos(channel_id, max_results=min(25, getattr(settings, "max_videos_per_channel", 25)))
 
-        # build empty transcripts mapping (we do metadata-only embeddings)
-        transcripts = {v.get("id"): "" for v in videos}
+        # the channel-title (seed) embedding happens inside process(), in its batch call
+        videos = await yt.get_channel_videos(
+            channel_id,
+            max_results=min(25, getattr(settings, "max_videos_per_channel", 25)),
+            channel=channel,
+        )
 
-        result = await orchestrator.process(channel=channel, videos=videos, transcripts=transcripts)
+        # metadata-only embeddings → no transcripts to pass
+        result = await orchestrator.process(channel=channel, videos=videos)
 
         return {"channel": channel, "videos": videos, "analysis": result}
 
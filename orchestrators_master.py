@@ -1,17 +1,25 @@
 # orchestrators_master.py
+import orjson
 import numpy as np
 from utils_logger import get_logger
-from services_embedding_service import embed_text, get_embedding_service
+from utils_helpers import clean_llm_output
+from services_embedding_service import embed_texts, get_embedding_service
 from services_vector_store import get_vector_store
 from services_llm_service import get_llm_service
 from config_settings import settings
 
 logger = get_logger("orchestrator")
 
+# matches LLMService.async_generate's MAX_CHARS
+MAX_PROMPT_CHARS = 7000
+
 class MasterOrchestrator:
     def __init__(self):
         # ensure services are initialized externally (main startup)
-        self.embedder = get_embedding_service({"model": settings.sentence_transformers_model})
+        self.embedder = get_embedding_service({
+            "model": settings.sentence_transformers_model,
+            "backend": settings.embedding_backend,
+        })
         self.vstore = get_vector_store()
         self.llm = get_llm_service({
             "groq_api_key": settings.groq_api_key,
@@ -24,6 +32,7 @@ class MasterOrchestrator:
         - embed title + description per video
         - store in HNSW
         - seed LLM with trimmed sample of videos + top semantic neighbors
+        `transcripts` is accepted for API compatibility but unused in this mode.
         """
         logger.info("Starting FULL MODE Orchestrator (HNSW metadata-only)")
 
@@ -32,24 +41,32 @@ class MasterOrchestrator:
         videos_sample = videos[:MAX_VIDEOS]
 
         # embed and store (metadata only)
+        # the channel title (seed) rides in the same batch as the videos; rows come back
+        # aligned with the input list, so it is sliced off by position
+        # stripped so a blank title means no seed (instead of a zero-vector seed row)
+        channel_title = (channel.get("snippet", {}).get("title", "") or channel.get("title", "") or "").strip()
         stored = 0
         semantic_snippets = []
+        seed_emb = None
+        # clip before embedding (MiniLM truncates at 256 tokens anyway) so one long
+        # description doesn't pad the whole batch to max length
+        entries = []
         for v in videos_sample:
-            vid = v.get("id")
-            title = v.get("title", "") or ""
-            desc = v.get("description", "") or ""
-            text_to_embed = (title + "\n\n" + desc).strip()
-            emb = embed_text(text_to_embed)
-            if emb is not None:
-                self.vstore.add(emb, vid)
-                stored += 1
-                semantic_snippets.append(text_to_embed[:300])
+            text = ((v.get("title", "") or "")[:200] + "\n" + (v.get("description", "") or "")[:300]).strip()
+            if text:
+                entries.append((v.get("id"), text))
+        batch = ([channel_title] if channel_title else []) + [text for _, text in entries]
+        mat = embed_texts(batch) if batch else None
+        if mat is not None:
+            if channel_title:
+                seed_emb, mat = mat[0], mat[1:]
+            if entries:
+                self.vstore.add_batch(mat, [vid for vid, _ in entries])
+                stored = len(entries)
+                semantic_snippets = [text[:300] for _, text in entries]
 
         logger.info(f"Stored {stored} metadata embeddings in HNSW.")
 
-        # Make a seed by embedding the channel title
-        channel_title = channel.get("snippet", {}).get("title", "") or channel.get("title", "") or ""
-        seed_emb = embed_text(channel_title) if channel_title else None
         seed_neighbors = self.vstore.search(seed_emb, k=top_k) if seed_emb is not None else []
 
         # Build compact prompt (trimmed titles/descriptions)
@@ -62,14 +79,12 @@ class MasterOrchestrator:
             logger.error(f"LLM call failed: {e}")
             return {"error": f"LLM call failed: {e}", "seed_neighbors": seed_neighbors}
 
-        # Try parse JSON; if fails, return raw text
+        # Parse JSON once here so /export never has to; report is None if it fails
         try:
-            import json
-            parsed = json.loads(llm_text_or_json)
-            return {"report": parsed, "seed_neighbors": seed_neighbors}
+            parsed = orjson.loads(clean_llm_output(llm_text_or_json).encode("utf-8"))
         except Exception:
-            # return raw text in report
-            return {"report": llm_text_or_json, "seed_neighbors": seed_neighbors}
+            parsed = None
+        return {"report": parsed, "raw": llm_text_or_json, "seed_neighbors": seed_neighbors}
 
     def _build_prompt(self, channel, videos, neighbors):
         # compact channel block
@@ -77,24 +92,36 @@ class MasterOrchestrator:
         ch_desc = channel.get("snippet", {}).get("description", "") or ""
         ch_summary = f"Channel: {ch_title}\nDescription: {ch_desc[:300]}"
 
+        # instructions: concise output
+        task = (
+            "\nTASK: Using the above, produce a concise JSON object with keys: executive_summary (string), themes (list of strings), top_recommendations (list of short objects with title/priority), and short_actionable_tips (list). Keep output minimal and JSON only."
+        )
+
+        # size guard: stop adding entries once the budget is used, keeping room for the task
+        # (LLMService trims anything past its 7000-char limit, which would cut the task off)
+        budget = MAX_PROMPT_CHARS - len(task) - 1
         lines = [ch_summary, "\nVideos (sample):"]
+        total = len(ch_summary) + 1 + len(lines[1])
         for v in videos:
             t = (v.get("title") or "")[:120]
             d = (v.get("description") or "")[:240]
-            lines.append(f"- {t}\n  {d}")
+            entry = f"- {t}\n  {d}"
+            if total + 1 + len(entry) > budget:
+                break
+            lines.append(entry)
+            total += 1 + len(entry)
 
         if neighbors:
-            lines.append("\nTop semantic neighbors (video ids & similarity):")
-            for vid, dist in neighbors:
-                lines.append(f"- {vid} (dist={dist:.4f})")
-
-        # instructions: concise output
-        lines.append(
-            "\nTASK: Using the above, produce a concise JSON object with keys: executive_summary (string), themes (list of strings), top_recommendations (list of short objects with title/priority), and short_actionable_tips (list). Keep output minimal and JSON only."
-        )
+            header = "\nTop semantic neighbors (video ids & similarity):"
+            if total + 1 + len(header) <= budget:
+                lines.append(header)
+                total += 1 + len(header)
+                for vid, dist in neighbors:
+                    entry = f"- {vid} (dist={dist:.4f})"
+                    if total + 1 + len(entry) > budget:
+                        break
+                    lines.append(entry)
+                    total += 1 + len(entry)
 
-        prompt = "\n".join(lines)
-        # final safety clip
-        if len(prompt) > 8000:
-            prompt = prompt[:8000]
-        return prompt
+        lines.append(task)
+        return "\n".join(lines)
@@ -1,235 +1,389 @@
 # report_service.py
 import io
+import copy
 import html
-from typing import Any, Dict
-from docx import Document
-from docx.shared import Pt
+import orjson
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from utils_logger import get_logger
 
 logger = get_logger("report_service")
 
+# non-ASCII separator can't be a bytes literal; encode it once
+_DASH = " — ".encode("utf-8")
 
-def _safe_str(x):
+# stand-in for a missing "metrics" key (an explicit null stays None); module-level
+# so its id() is stable for the _safe_str memo
+_EMPTY: Dict[str, Any] = {}
+
+
+def _safe_str(x, cache: Optional[Dict[int, str]] = None):
+    """
+    `cache` memoizes dict/list serialization by id() for the duration of one report
+    build (see build_all_reports); the objects it keys on must outlive it.
+    """
+    # most fields are already strings: skip the isinstance chain and str() call
+    if type(x) is str:
+        return x
     if x is None:
         return "Not Available"
     if isinstance(x, (dict, list)):
+        if cache is not None:
+            hit = cache.get(id(x))
+            if hit is not None:
+                return hit
         try:
-            import json
-            return json.dumps(x, ensure_ascii=False, indent=2)
+            out = orjson.dumps(x, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode("utf-8")
         except Exception:
-            return str(x)
+            out = str(x)
+        if cache is not None:
+            cache[id(x)] = out
+        return out
     return str(x)
 
 
 # ---------------------------
-# Plain text report generator
+# Normalized input shared by all builders
 # ---------------------------
-def build_text_report(channel: Dict[str, Any], analysis: Dict[str, Any]) -> bytes:
-    lines = []
-    title = channel.get("snippet", {}).get("title") or channel.get("title") or "Channel"
-    lines.append(f"{title}")
-    lines.append(f"Generated: {datetime.utcnow().isoformat()} UTC")
-    lines.append("=" * 60)
-    lines.append("\nCHANNEL METADATA\n")
-    lines.append(f"Title: {title}")
-    lines.append(f"Description: {_safe_str(channel.get('snippet', {}).get('description'))}")
+@dataclass(slots=True)
+class ReportIR:
+    """
+    channel + analysis walked once. Raw values are kept (not pre-formatted):
+    each builder applies its own defaults and escaping.
+    """
+    title: Optional[str]
+    desc: Optional[str]
+    subs: str
+    views: str
+    vids: str
+    generated: str
+    report: Any                 # dict → sections below are filled; otherwise rendered as-is
+    is_dict: bool
+    exec_summary: Any
+    metrics: Any                # _EMPTY when the key is missing, None when it is null
+    themes: List[Any]
+    recs: List[Any]
+    neighbors: List[Any]
+
+
+def _normalize(channel: Dict[str, Any], analysis: Dict[str, Any]) -> ReportIR:
+    snippet = channel.get("snippet", {}) or {}
     stats = channel.get("statistics", {}) or {}
-    lines.append(f"Subscribers: {stats.get('subscriberCount', 'Not Available')}")
-    lines.append(f"Total views: {stats.get('viewCount', 'Not Available')}")
-    lines.append(f"Video count: {stats.get('videoCount', 'Not Available')}")
-    lines.append("\nANALYSIS\n")
-    report = analysis.get("report") if isinstance(analysis, dict) else analysis
-    if isinstance(report, dict):
+    is_analysis_dict = isinstance(analysis, dict)
+    report = analysis.get("report") if is_analysis_dict else analysis
+    is_dict = isinstance(report, dict)
+    return ReportIR(
+        title=snippet.get("title") or channel.get("title"),
+        desc=snippet.get("description"),
+        subs=str(stats.get("subscriberCount", "Not Available")),
+        views=str(stats.get("viewCount", "Not Available")),
+        vids=str(stats.get("videoCount", "Not Available")),
+        generated=datetime.utcnow().isoformat(),
+        report=report,
+        is_dict=is_dict,
+        exec_summary=(report.get("executive_summary") or report.get("summary")) if is_dict else None,
+        metrics=report.get("metrics", _EMPTY) if is_dict else None,
+        themes=(report.get("themes") or []) if is_dict else [],
+        recs=(report.get("recommendations") or []) if is_dict else [],
+        neighbors=(analysis.get("seed_neighbors") or analysis.get("neighbors") or []) if is_analysis_dict else [],
+    )
+
+
+# ---------------------------
+# Plain text report generator
+# ---------------------------
+def build_text_report(
+    channel: Dict[str, Any],
+    analysis: Dict[str, Any],
+    cache: Optional[Dict[int, str]] = None,
+    ir: Optional[ReportIR] = None,
+) -> bytes:
+    if ir is None:
+        ir = _normalize(channel, analysis)
+    # UTF-8 written straight into one buffer: static parts are byte literals, only
+    # user data is encoded. Lines are "\n"-joined, so every line after the first
+    # starts with b"\n".
+    bio = io.BytesIO()
+    w = bio.write
+    title = (ir.title or "Channel").encode()
+    w(title)
+    w(f"\nGenerated: {ir.generated} UTC".encode())
+    w(b"\n" + b"=" * 60)
+    w(b"\n\nCHANNEL METADATA\n")
+    w(b"\nTitle: ")
+    w(title)
+    w(b"\nDescription: ")
+    w(_safe_str(ir.desc, cache).encode())
+    w(b"\nSubscribers: ")
+    w(ir.subs.encode())
+    w(b"\nTotal views: ")
+    w(ir.views.encode())
+    w(b"\nVideo count: ")
+    w(ir.vids.encode())
+    w(b"\n\nANALYSIS\n")
+    if ir.is_dict:
         # try to pick standard keys
-        es = report.get("executive_summary") or report.get("summary") or report
-        lines.append("Executive summary:\n")
-        lines.append(_safe_str(es))
-        lines.append("\nMetrics:\n")
-        lines.append(_safe_str(report.get("metrics", "Not Available")))
-        lines.append("\nThemes:\n")
-        themes = report.get("themes") or []
+        w(b"\nExecutive summary:\n\n")
+        w(_safe_str(ir.exec_summary or ir.report, cache).encode())
+        w(b"\n\nMetrics:\n\n")
+        w(_safe_str("Not Available" if ir.metrics is _EMPTY else ir.metrics, cache).encode())
+        w(b"\n\nThemes:\n")
+        themes = ir.themes
         if themes:
             for t in themes:
                 if isinstance(t, dict) and "name" in t:
-                    lines.append(f"- {t.get('name')} (freq={t.get('frequency', '')})")
+                    w(f"\n- {t.get('name')} (freq={t.get('frequency', '')})".encode())
                 else:
-                    lines.append(f"- {t}")
+                    w(f"\n- {t}".encode())
         else:
-            lines.append("Not Available")
-        lines.append("\nRecommendations:\n")
-        recs = report.get("recommendations") or []
+            w(b"\nNot Available")
+        w(b"\n\nRecommendations:\n")
+        recs = ir.recs
         if recs:
             for r in recs:
                 if isinstance(r, dict):
-                    lines.append(f"- {r.get('title','')} — {r.get('description','')}")
+                    w(f"\n- {r.get('title','')} — {r.get('description','')}".encode())
                 else:
-                    lines.append(f"- {r}")
+                    w(f"\n- {r}".encode())
         else:
-            lines.append("Not Available")
+            w(b"\nNot Available")
     else:
         # report is text
-        lines.append(_safe_str(report))
+        w(b"\n")
+        w(_safe_str(ir.report, cache).encode())
 
     # semantic neighbors
-    neighbors = analysis.get("seed_neighbors") or analysis.get("neighbors") or []
-    if neighbors:
-        lines.append("\nTop semantic neighbors (ids and similarity):")
-        for n in neighbors:
+    if ir.neighbors:
+        w(b"\n\nTop semantic neighbors (ids and similarity):")
+        for n in ir.neighbors:
             if isinstance(n, (list, tuple)):
-                lines.append(f"- {n[0]} (dist={n[1]})")
+                w(f"\n- {n[0]} (dist={n[1]})".encode())
             elif isinstance(n, dict):
                 vid = n.get("video_id") or n.get("id") or "unknown"
-                lines.append(f"- {vid} (dist={n.get('distance','')})")
+                w(f"\n- {vid} (dist={n.get('distance','')})".encode())
 
-    payload = "\n".join(lines)
-    return payload.encode("utf-8")
+    return bio.getvalue()
 
 
 # ---------------------------
 # DOCX report generator
 # ---------------------------
-def build_docx_report(channel: Dict[str, Any], analysis: Dict[str, Any]) -> bytes:
+def _add_list(add_p, items, style: str):
+    """
+    Append one styled paragraph per item. Only the first goes through add_paragraph
+    (style lookup + property setters); the rest are lxml copies of it with the text
+    swapped, chained after one another.
+    """
+    if not items:
+        return
+    proto = add_p(items[0], style=style)._p
+    if not proto.r_lst:
+        # add_paragraph("") emits no run → nothing to overwrite in copies
+        for text in items[1:]:
+            add_p(text, style=style)
+        return
+    last = proto
+    for text in items[1:]:
+        p = copy.deepcopy(proto)
+        p.r_lst[0].text = text
+        last.addnext(p)
+        last = p
+
+
+def build_docx_report(
+    channel: Dict[str, Any],
+    analysis: Dict[str, Any],
+    cache: Optional[Dict[int, str]] = None,
+    ir: Optional[ReportIR] = None,
+) -> bytes:
+    # python-docx is only loaded for DOCX builds (text/HTML callers skip it)
+    from docx import Document
+
+    if ir is None:
+        ir = _normalize(channel, analysis)
     doc = Document()
+    add_p = doc.add_paragraph
+    add_h = doc.add_heading
     # Title
-    title = channel.get("snippet", {}).get("title") or channel.get("title") or "Channel Report"
-    doc.add_heading(title, level=1)
-    doc.add_paragraph(f"Generated: {datetime.utcnow().isoformat()} UTC")
+    add_h(ir.title or "Channel Report", level=1)
+    add_p(f"Generated: {ir.generated} UTC")
 
     # Channel metadata
-    doc.add_heading("Channel metadata", level=2)
-    desc = channel.get("snippet", {}).get("description") or ""
-    p = doc.add_paragraph()
+    add_h("Channel metadata", level=2)
+    p = add_p()
     p.add_run("Description: ").bold = True
-    p.add_run(desc)
+    p.add_run(ir.desc or "")
 
-    stats = channel.get("statistics", {}) or {}
-    p = doc.add_paragraph()
-    p.add_run("Subscribers: ").bold = True
-    p.add_run(str(stats.get("subscriberCount", "Not Available")))
-    p.add_run("    ")
-    p.add_run("Total views: ").bold = True
-    p.add_run(str(stats.get("viewCount", "Not Available")))
-    p.add_run("    ")
-    p.add_run("Video count: ").bold = True
-    p.add_run(str(stats.get("videoCount", "Not Available")))
+    p = add_p()
+    add_run = p.add_run
+    add_run("Subscribers: ").bold = True
+    add_run(ir.subs)
+    add_run("    ")
+    add_run("Total views: ").bold = True
+    add_run(ir.views)
+    add_run("    ")
+    add_run("Video count: ").bold = True
+    add_run(ir.vids)
 
     # Analysis
-    doc.add_heading("Analysis", level=2)
-    report = analysis.get("report") if isinstance(analysis, dict) else analysis
-    if isinstance(report, dict):
+    add_h("Analysis", level=2)
+    if ir.is_dict:
         # executive summary
-        doc.add_heading("Executive summary", level=3)
-        es = report.get("executive_summary") or report.get("summary") or ""
-        doc.add_paragraph(_safe_str(es))
+        add_h("Executive summary", level=3)
+        add_p(_safe_str(ir.exec_summary or "", cache))
 
         # metrics
-        doc.add_heading("Metrics", level=3)
-        metrics = report.get("metrics", {})
-        for k, v in (metrics.items() if isinstance(metrics, dict) else []):
-            doc.add_paragraph(f"{k}: {_safe_str(v)}", style="List Bullet")
+        add_h("Metrics", level=3)
+        metrics = ir.metrics
+        _add_list(add_p, [f"{k}: {_safe_str(v, cache)}" for k, v in (metrics.items() if isinstance(metrics, dict) else [])], "List Bullet")
 
         # themes
-        doc.add_heading("Themes", level=3)
-        themes = report.get("themes") or []
-        for t in themes:
-            if isinstance(t, dict):
-                doc.add_paragraph(f"{t.get('name')} — freq: {t.get('frequency','')}, engagement: {t.get('engagement','')}", style="List Bullet")
-            else:
-                doc.add_paragraph(str(t), style="List Bullet")
+        add_h("Themes", level=3)
+        _add_list(add_p, [
+            f"{t.get('name')} — freq: {t.get('frequency','')}, engagement: {t.get('engagement','')}" if isinstance(t, dict) else str(t)
+            for t in ir.themes
+        ], "List Bullet")
 
         # recommendations
-        doc.add_heading("Recommendations", level=3)
-        recs = report.get("recommendations") or []
-        for r in recs:
+        add_h("Recommendations", level=3)
+        for r in ir.recs:
             if isinstance(r, dict):
-                p = doc.add_paragraph(style="List Number")
+                p = add_p(style="List Number")
                 p.add_run(r.get("title", "Recommendation")).bold = True
-                p.add_run("\n" + _safe_str(r.get("description", "")))
+                p.add_run("\n" + _safe_str(r.get("description", ""), cache))
             else:
-                doc.add_paragraph(str(r), style="List Number")
+                add_p(str(r), style="List Number")
     else:
-        doc.add_paragraph(_safe_str(report))
+        add_p(_safe_str(ir.report, cache))
 
     # seed neighbors
-    neighbors = analysis.get("seed_neighbors") or analysis.get("neighbors") or []
-    if neighbors:
-        doc.add_heading("Semantic neighbors", level=2)
-        for n in neighbors:
+    if ir.neighbors:
+        add_h("Semantic neighbors", level=2)
+        items = []
+        for n in ir.neighbors:
             if isinstance(n, (list, tuple)):
-                doc.add_paragraph(f"{n[0]} — distance: {n[1]}", style="List Bullet")
+                items.append(f"{n[0]} — distance: {n[1]}")
             elif isinstance(n, dict):
                 vid = n.get("video_id") or n.get("id") or ""
-                doc.add_paragraph(f"{vid} — distance: {n.get('distance','')}", style="List Bullet")
+                items.append(f"{vid} — distance: {n.get('distance','')}")
+        _add_list(add_p, items, "List Bullet")
 
     # Save to bytes
     bio = io.BytesIO()
     doc.save(bio)
-    bio.seek(0)
-    return bio.read()
+    return bio.getvalue()
 
 
 # ---------------------------
 # HTML report generator
 # ---------------------------
-def build_html_report(channel: Dict[str, Any], analysis: Dict[str, Any]) -> bytes:
-    title = html.escape(channel.get("snippet", {}).get("title") or channel.get("title") or "Channel Report")
-    desc = html.escape(channel.get("snippet", {}).get("description") or "")
-    report = analysis.get("report") if isinstance(analysis, dict) else analysis
-    now = datetime.utcnow().isoformat()
+def build_html_report(
+    channel: Dict[str, Any],
+    analysis: Dict[str, Any],
+    cache: Optional[Dict[int, str]] = None,
+    ir: Optional[ReportIR] = None,
+) -> bytes:
+    if ir is None:
+        ir = _normalize(channel, analysis)
+    esc = html.escape
+    title = esc(ir.title or "Channel Report")
+    desc = esc(ir.desc or "")
+
+    # single BytesIO writer: static fragments are byte literals, only user strings
+    # are escaped + encoded
+    bio = io.BytesIO()
+    write = bio.write
 
     # header
-    html_parts = [
-        "<!doctype html>",
-        "<html><head><meta charset='utf-8'><title>Channel Report</title>",
-        "<style>body{font-family:Arial,Helvetica,sans-serif;margin:24px}h1{color:#111}pre{background:#f6f6f6;padding:12px;border-radius:6px}</style>",
-        "</head><body>"
-    ]
-    html_parts.append(f"<h1>{title}</h1>")
-    html_parts.append(f"<p><em>Generated: {now} UTC</em></p>")
-    html_parts.append("<h2>Channel metadata</h2>")
-    html_parts.append(f"<p><strong>Description:</strong> {desc}</p>")
-    stats = channel.get("statistics") or {}
-    html_parts.append(f"<p><strong>Subscribers:</strong> {stats.get('subscriberCount', 'Not Available')} &nbsp;&nbsp; <strong>Total views:</strong> {stats.get('viewCount','Not Available')} &nbsp;&nbsp; <strong>Videos:</strong> {stats.get('videoCount','Not Available')}</p>")
-
-    html_parts.append("<h2>Analysis</h2>")
-    if isinstance(report, dict):
-        html_parts.append("<h3>Executive summary</h3>")
-        html_parts.append(f"<pre>{html.escape(_safe_str(report.get('executive_summary') or report.get('summary') or ''))}</pre>")
-
-        html_parts.append("<h3>Metrics</h3>")
-        html_parts.append(f"<pre>{html.escape(_safe_str(report.get('metrics', {})))}</pre>")
-
-        html_parts.append("<h3>Themes</h3><ul>")
-        for t in (report.get("themes") or []):
+    write(
+        b"<!doctype html>\n"
+        b"<html><head><meta charset='utf-8'><title>Channel Report</title>\n"
+        b"<style>body{font-family:Arial,Helvetica,sans-serif;margin:24px}h1{color:#111}pre{background:#f6f6f6;padding:12px;border-radius:6px}</style>\n"
+        b"</head><body>\n"
+    )
+    write(b"<h1>")
+    write(title.encode())
+    write(b"</h1>\n<p><em>Generated: ")
+    write(ir.generated.encode())
+    write(b" UTC</em></p>\n")
+    write(b"<h2>Channel metadata</h2>\n")
+    write(b"<p><strong>Description:</strong> ")
+    write(desc.encode())
+    write(b"</p>\n")
+    write(f"<p><strong>Subscribers:</strong> {ir.subs} &nbsp;&nbsp; <strong>Total views:</strong> {ir.views} &nbsp;&nbsp; <strong>Videos:</strong> {ir.vids}</p>\n".encode())
+
+    write(b"<h2>Analysis</h2>\n")
+    if ir.is_dict:
+        write(b"<h3>Executive summary</h3>\n<pre>")
+        write(esc(_safe_str(ir.exec_summary or '', cache)).encode())
+        write(b"</pre>\n")
+
+        write(b"<h3>Metrics</h3>\n<pre>")
+        write(esc(_safe_str(ir.metrics, cache)).encode())
+        write(b"</pre>\n")
+
+        write(b"<h3>Themes</h3><ul>\n")
+        themes = ir.themes
+        # batch-escape the names, then emit
+        names = list(map(esc, [str(t.get('name')) if isinstance(t, dict) else str(t) for t in themes]))
+        for t, name in zip(themes, names):
+            write(b"<li>")
+            write(name.encode())
             if isinstance(t, dict):
-                html_parts.append(f"<li>{html.escape(str(t.get('name')))} — freq: {t.get('frequency','')}</li>")
-            else:
-                html_parts.append(f"<li>{html.escape(str(t))}</li>")
-        html_parts.append("</ul>")
+                write(f" — freq: {t.get('frequency','')}".encode())
+            write(b"</li>\n")
+        write(b"</ul>\n")
 
-        html_parts.append("<h3>Recommendations</h3><ul>")
-        for r in (report.get("recommendations") or []):
+        write(b"<h3>Recommendations</h3><ul>\n")
+        for r in ir.recs:
             if isinstance(r, dict):
-                html_parts.append(f"<li><strong>{html.escape(r.get('title',''))}</strong> — {html.escape(_safe_str(r.get('description','')))}</li>")
+                write(b"<li><strong>")
+                write(esc(r.get('title','')).encode())
+                write(b"</strong>")
+                write(_DASH)
+                write(esc(_safe_str(r.get('description',''), cache)).encode())
+                write(b"</li>\n")
             else:
-                html_parts.append(f"<li>{html.escape(str(r))}</li>")
-        html_parts.append("</ul>")
+                write(b"<li>")
+                write(esc(str(r)).encode())
+                write(b"</li>\n")
+        write(b"</ul>\n")
     else:
-        html_parts.append(f"<pre>{html.escape(_safe_str(report))}</pre>")
+        write(b"<pre>")
+        write(esc(_safe_str(ir.report, cache)).encode())
+        write(b"</pre>\n")
 
     # neighbors
-    neighbors = analysis.get("seed_neighbors") or analysis.get("neighbors") or []
-    if neighbors:
-        html_parts.append("<h3>Semantic neighbors</h3><ul>")
-        for n in neighbors:
+    if ir.neighbors:
+        write(b"<h3>Semantic neighbors</h3><ul>\n")
+        for n in ir.neighbors:
             if isinstance(n, (list, tuple)):
-                html_parts.append(f"<li>{html.escape(str(n[0]))} — {n[1]}</li>")
+                write(b"<li>")
+                write(esc(str(n[0])).encode())
+                write(f" — {n[1]}</li>\n".encode())
             elif isinstance(n, dict):
                 vid = n.get("video_id") or n.get("id") or ""
-                html_parts.append(f"<li>{html.escape(vid)} — {html.escape(_safe_str(n.get('distance','')))}</li>")
-        html_parts.append("</ul>")
+                write(b"<li>")
+                write(esc(vid).encode())
+                write(_DASH)
+                write(esc(_safe_str(n.get('distance',''), cache)).encode())
+                write(b"</li>\n")
+        write(b"</ul>\n")
+
+    write(b"</body></html>")
+    return bio.getvalue()
 
-    html_parts.append("</body></html>")
-    html_content = "\n".join(html_parts)
-    return html_content.encode("utf-8")
+
+# ---------------------------
+# All three formats, sharing one normalized input and serialization cache
+# ---------------------------
+def build_all_reports(channel: Dict[str, Any], analysis: Dict[str, Any]) -> Dict[str, bytes]:
+    # scoped to this call: ids are only stable while `analysis` is alive
+    cache: Dict[int, str] = {}
+    ir = _normalize(channel, analysis)
+    return {
+        "txt": build_text_report(channel, analysis, cache, ir),
+        "docx": build_docx_report(channel, analysis, cache, ir),
+        "html": build_html_report(channel, analysis, cache, ir),
+    }
@@ -1,33 +1,61 @@
 # services_embedding_service.py
 import os
+import hashlib
 import numpy as np
-from fastembed import TextEmbedding
+from typing import Optional
+from cachetools import LRUCache
 from utils_logger import get_logger
 
 logger = get_logger("embedding_service")
 
 _EMBED_MODEL_DEFAULT = os.getenv("SENTENCE_TRANSFORMERS_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 _EMBED_DIM = 384
+# fastembed's int8-quantized 384-dim ONNX model (Qdrant/bge-small-en-v1.5-onnx-Q);
+# fastembed ships no quantized MiniLM-L6, and this keeps the index dim unchanged
+_EMBED_MODEL_INT8 = "BAAI/bge-small-en-v1.5"
 
 _embedder = None
 
+# in-process cache: normalized text -> embedding (numpy arrays aren't hashable,
+# so functools.lru_cache can't be used on the vectors directly)
+_embed_cache = LRUCache(maxsize=4096)
+
+
+def _cache_key(text: str) -> bytes:
+    return hashlib.blake2b(text.strip().lower().encode("utf-8"), digest_size=16).digest()
+
 
 def get_embedding_service(config: dict = None):
     global _embedder
     if _embedder is None:
+        # fastembed pulls in onnxruntime (hundreds of MB, ~300 ms) → load on first use
+        from fastembed import TextEmbedding
+
         model = None
+        backend = "fastembed"
         if config and isinstance(config, dict):
             model = config.get("model")
-        model_name = model or _EMBED_MODEL_DEFAULT
-        logger.info(f"Loading embedding model: {model_name}")
-        _embedder = TextEmbedding(model_name)
+            backend = config.get("backend") or backend
+        if backend == "fastembed-onnx-int8":
+            logger.info(f"Loading int8 ONNX embedding model: {_EMBED_MODEL_INT8}")
+            _embedder = TextEmbedding(_EMBED_MODEL_INT8, providers=["CPUExecutionProvider"])
+        else:
+            model_name = model or _EMBED_MODEL_DEFAULT
+            logger.info(f"Loading embedding model: {model_name}")
+            _embedder = TextEmbedding(model_name)
     return _embedder
 
 
+def _l2_normalize(arr: np.ndarray) -> np.ndarray:
+    """Unit-length rows (in place), so downstream cosine == inner product. Zero rows stay zero."""
+    arr /= np.linalg.norm(arr, axis=-1, keepdims=True).clip(min=1e-12)
+    return arr
+
+
 def embed_text(text: str):
     """
-    Returns numpy array (dim,) or None.
-    Fix: FastEmbed returns a generator → wrap with list().
+    Returns L2-normalized numpy array (dim,) or None.
+    FastEmbed returns a generator → take its first item with next().
     """
     global _embedder
     if not _embedder:
@@ -35,15 +63,85 @@ def embed_text(text: str):
     if not text or not text.strip():
         return None
 
-    # FastEmbed returns a generator → convert to list
+    key = _cache_key(text)
+    cached = _embed_cache.get(key)
+    if cached is not None:
+        return cached.copy()
+
     try:
-        emb_list = list(_embedder.embed([text]))
-        if not emb_list:
+        emb = next(iter(_embedder.embed([text])), None)
+        if emb is None:
             return None
 
-        emb = emb_list[0]
-        return np.array(emb, dtype=np.float32)
+        # no copy when fastembed already hands back a contiguous float32 row
+        emb = _l2_normalize(np.ascontiguousarray(emb, dtype=np.float32))
+        _embed_cache[key] = emb
+        return emb.copy()
 
     except Exception as e:
         logger.error(f"Embedding failed: {e}")
         return None
+
+
+def embed_texts(texts: list, batch_size: int = 64) -> Optional[np.ndarray]:
+    """
+    Batched variant of embed_text.
+    Returns a float32 matrix (N, dim) of L2-normalized rows aligned with
+    `texts`, or None if the model call fails. Empty texts give zero rows,
+    so callers should drop them first.
+
+    Inputs are encoded shortest-first so each batch pads to a similar
+    length, then scattered back to their original positions. Callers
+    must not rely on the order texts reach the tokenizer.
+    """
+    global _embedder
+    if not _embedder:
+        get_embedding_service()
+
+    n = len(texts)
+    hits = []  # (row, cached vector)
+
+    # serve cache hits; group misses by key so duplicates are embedded once
+    misses = {}
+    for i, t in enumerate(texts):
+        if not t or not t.strip():
+            continue
+        key = _cache_key(t)
+        cached = _embed_cache.get(key)
+        if cached is not None:
+            hits.append((i, cached))
+        else:
+            misses.setdefault(key, []).append(i)
+
+    # one contiguous (N, dim) block, written in place; zeros so empty texts stay zero rows.
+    # Allocated on the first vector seen, so the width follows whichever model is loaded.
+    out = None
+
+    if misses:
+        keys = list(misses)
+        # sort by (approximate) token length to cut padding inside each batch
+        keys.sort(key=lambda k: len(texts[misses[k][0]].split()))
+
+        # one model call for the whole batch instead of one per text
+        try:
+            embs = _embedder.embed([texts[misses[k][0]] for k in keys], batch_size=batch_size)
+            for key, emb in zip(keys, embs):
+                if out is None:
+                    out = np.zeros((n, len(emb)), dtype=np.float32)
+                first, *dups = misses[key]
+                row = out[first]
+                np.copyto(row, emb)
+                _l2_normalize(row)
+                _embed_cache[key] = row.copy()
+                for i in dups:
+                    out[i] = row
+        except Exception as e:
+            logger.error(f"Batch embedding failed: {e}")
+            return None
+
+    if out is None:
+        out = np.zeros((n, hits[0][1].shape[0] if hits else _EMBED_DIM), dtype=np.float32)
+    # copied into the block, so cached vectors are never handed out directly
+    for i, cached in hits:
+        out[i] = cached
+    return out
@@ -1,12 +1,30 @@
-import json
-from typing import Dict, Any
-from groq import Groq
+import asyncio
+import orjson
+import httpx
+from typing import Dict, Any, List
 from utils_logger import get_logger
 
 logger = get_logger("llm_service")
 
 _llm_service_instance = None
 
+# one pooled async HTTP client shared by every LLM call (keep-alive + HTTP/2)
+_http_client = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(http2=True, timeout=200)
+    return _http_client
+
+
+async def aclose():
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+
 
 def get_llm_service(config: Dict[str, Any] = None):
     global _llm_service_instance
@@ -31,17 +49,20 @@ class LLMService:
         Groq() internally passes `proxies=` to httpx.Client(), which crashes
         on some deployments.
 
-        Solution → Create client WITHOUT httpx wrapper (safe mode)
+        Solution → hand the SDK our own httpx.AsyncClient, so it never builds one.
+        The async client keeps LLM calls from blocking the event loop.
         """
+        from groq import AsyncGroq
+
         try:
-            self.client = Groq(api_key=self.api_key, http_client=None)
+            self.client = AsyncGroq(api_key=self.api_key, http_client=_get_http_client())
         except TypeError:
             # fallback for older SDKs
-            self.client = Groq(api_key=self.api_key)
+            self.client = AsyncGroq(api_key=self.api_key)
 
     async def test_connection(self) -> bool:
         try:
-            res = self.client.chat.completions.create(
+            res = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[{"role": "user", "content": "Say OK"}],
                 max_tokens=3,
@@ -61,7 +82,7 @@ class LLMService:
             prompt = prompt[:MAX_CHARS]
 
         try:
-            completion = self.client.chat.completions.create(
+            completion = await self.client.chat.completions.create(
                 model=self.model,
                 temperature=0.2,
                 max_tokens=1400,
@@ -76,6 +97,20 @@ class LLMService:
             logger.error(f"LLM call exception: {e}")
 
             try:
-                return json.dumps({"error": str(e)})
+                return orjson.dumps({"error": str(e)}).decode("utf-8")
             except:
-                return json.dumps({"error": "LLM call failed"})
+                return orjson.dumps({"error": "LLM call failed"}).decode("utf-8")
+
+    async def generate_many(self, prompts: List[str], concurrency: int = 5) -> List[str]:
+        """
+        Run several prompts concurrently (at most `concurrency` in flight, to stay
+        under Groq rate limits). Results keep the order of `prompts`; a failed API call
+        yields the same {"error": ...} JSON string as async_generate.
+        """
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(prompt: str) -> str:
+            async with sem:
+                return await self.async_generate(prompt)
+
+        return list(await asyncio.gather(*(one(p) for p in prompts)))
@@ -1,41 +1,192 @@
 # services_vector_store.py
-import hnswlib
+import os
 import numpy as np
 from typing import List, Tuple
 from utils_logger import get_logger
+from config_settings import settings
 
 logger = get_logger("vector_store")
 
+
+def configure_hnsw_params(count: int) -> Tuple[int, int, int]:
+    """
+    Recommended (M, ef_construction, ef_search) for an index holding `count` vectors.
+    Small per-channel indexes use the configured values; larger ones widen the graph/beam,
+    but never below what was configured (a user's higher HNSW_* setting always wins).
+    """
+    if count < 10_000:
+        m, efc, efs = 0, 0, 0
+    elif count < 100_000:
+        m, efc, efs = 16, 128, 64
+    elif count < 1_000_000:
+        m, efc, efs = 24, 200, 100
+    else:
+        m, efc, efs = 32, 256, 128
+    return (
+        max(settings.hnsw_m, m),
+        max(settings.hnsw_ef_construction, efc),
+        max(settings.hnsw_ef_search, efs),
+    )
+
+
 class HNSWVectorStore:
-    def __init__(self, dim=384, max_elements=5000):
+    """
+    Inner-product HNSW index. Stored vectors must already be L2-normalized
+    (embed_text / embed_texts do this), so distance = 1 - dot = cosine distance
+    without hnswlib re-normalizing on every call. Queries are normalized here.
+    """
+    def __init__(self, dim=384, max_elements=5000, M=16, ef_construction=64, ef_search=40):
+        import hnswlib
+
         self.dim = dim
         self.max_elements = max_elements
-        self.index = hnswlib.Index(space='cosine', dim=dim)
-        logger.info("Initializing HNSW index...")
-        self.index.init_index(max_elements=max_elements, ef_construction=100, M=32)
-        self.index.set_ef(64)
+        self.index = hnswlib.Index(space='ip', dim=dim)
+        logger.info(f"Initializing HNSW index (M={M}, ef_construction={ef_construction}, ef_search={ef_search})...")
+        self.index.init_index(max_elements=max_elements, ef_construction=ef_construction, M=M)
+        self.index.set_ef(ef_search)
+        self.ef_search = ef_search
+        # bulk add_items / knn_query fan out across cores
+        self.index.set_num_threads(os.cpu_count() or 1)
+        self.ids = []
+
+    def autotune(self):
+        """
+        Re-pick ef_search for the current element count (M/ef_construction are fixed
+        once built). Runs after every add_batch; only acts when a size bucket is crossed,
+        and only ever widens the beam.
+        """
+        count = self.index.get_current_count()
+        _, _, ef_search = configure_hnsw_params(count)
+        if ef_search > self.ef_search:
+            self.index.set_ef(ef_search)
+            self.ef_search = ef_search
+            logger.info(f"HNSW ef_search={ef_search} for {count} elements")
+
+    def add(self, embedding: np.ndarray, video_id: str):
+        if embedding is None:
+            return
+        # same path as bulk inserts: grows the index when full and re-tunes ef_search
+        self.add_batch(embedding.reshape(1, -1), [video_id])
+
+    def add_batch(self, embeddings: np.ndarray, video_ids: List[str]):
+        """Insert an (N, dim) matrix with one add_items call."""
+        if embeddings is None or len(video_ids) == 0:
+            return
+        start = len(self.ids)
+        end = start + len(video_ids)
+        if end > self.max_elements:
+            # the store lives for the whole process: grow (doubling) instead of failing when full
+            self.max_elements = max(end, 2 * self.max_elements)
+            self.index.resize_index(self.max_elements)
+        self.ids.extend(video_ids)
+        mat = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.index.add_items(mat, np.arange(start, end))
+        self.autotune()
+
+    def search(self, embedding: np.ndarray, k=5) -> List[Tuple[str, float]]:
+        if embedding is None:
+            return []
+        return self.search_batch(embedding.reshape(1, -1), k=k)[0]
+
+    def search_batch(self, embeddings: np.ndarray, k=5) -> List[List[Tuple[str, float]]]:
+        """k-NN for a (B, dim) matrix of queries in one knn_query call → one result list per row."""
+        if embeddings is None or len(embeddings) == 0:
+            return []
+        if len(self.ids) == 0:
+            return [[] for _ in range(len(embeddings))]
+        # hnswlib can't return more neighbors than it holds
+        k = min(k, self.index.get_current_count())
+        mat = np.array(embeddings, dtype=np.float32)
+        mat /= np.linalg.norm(mat, axis=1, keepdims=True).clip(min=1e-12)
+        labels, distances = self.index.knn_query(mat, k=k)
+        n_ids = len(self.ids)
+        return [
+            [(self.ids[i], float(d)) for i, d in zip(row_labels, row_dists) if i < n_ids]
+            for row_labels, row_dists in zip(labels, distances)
+        ]
+
+class FaissSQVectorStore:
+    """
+    Same interface as HNSWVectorStore, but the HNSW graph walks scalar-quantized
+    vectors (faiss IndexHNSWSQ): fp16 halves and sq8 quarters the bytes per stored
+    vector, i.e. fewer cache misses per hop. Vectors must be L2-normalized;
+    distances are reported as 1 - dot like the hnswlib store.
+    """
+    def __init__(self, dim=384, quantizer="fp16", M=16, ef_construction=64, ef_search=40):
+        import faiss
+
+        qtypes = {"fp16": faiss.ScalarQuantizer.QT_fp16, "sq8": faiss.ScalarQuantizer.QT_8bit}
+        self.dim = dim
+        self.index = faiss.IndexHNSWSQ(dim, qtypes[quantizer], M, faiss.METRIC_INNER_PRODUCT)
+        logger.info(f"Initializing FAISS HNSW-SQ index ({quantizer}, M={M}, ef_construction={ef_construction}, ef_search={ef_search})...")
+        self.index.hnsw.efConstruction = ef_construction
+        self.index.hnsw.efSearch = ef_search
+        self.ef_search = ef_search
+        if not self.index.is_trained:
+            # unit-length embeddings: every component lies in [-1, 1], so the
+            # quantizer range is known up front instead of learned from data
+            self.index.train(np.stack([-np.ones(dim), np.ones(dim)]).astype(np.float32))
         self.ids = []
 
+    def autotune(self):
+        count = self.index.ntotal
+        _, _, ef_search = configure_hnsw_params(count)
+        if ef_search > self.ef_search:
+            self.index.hnsw.efSearch = ef_search
+            self.ef_search = ef_search
+            logger.info(f"HNSW ef_search={ef_search} for {count} elements")
+
     def add(self, embedding: np.ndarray, video_id: str):
         if embedding is None:
             return
-        idx = len(self.ids)
-        self.ids.append(video_id)
-        self.index.add_items(embedding.reshape(1, -1), np.array([idx]))
+        self.add_batch(embedding.reshape(1, -1), [video_id])
+
+    def add_batch(self, embeddings: np.ndarray, video_ids: List[str]):
+        if embeddings is None or len(video_ids) == 0:
+            return
+        self.ids.extend(video_ids)
+        # faiss labels rows sequentially, matching positions in self.ids
+        self.index.add(np.ascontiguousarray(embeddings, dtype=np.float32))
+        self.autotune()
 
     def search(self, embedding: np.ndarray, k=5) -> List[Tuple[str, float]]:
-        if embedding is None or len(self.ids) == 0:
+        if embedding is None:
             return []
-        labels, distances = self.index.knn_query(embedding.reshape(1, -1), k=k)
-        results = []
-        for i, d in zip(labels[0], distances[0]):
-            if i < len(self.ids):
-                results.append((self.ids[i], float(d)))
-        return results
+        return self.search_batch(embedding.reshape(1, -1), k=k)[0]
+
+    def search_batch(self, embeddings: np.ndarray, k=5) -> List[List[Tuple[str, float]]]:
+        if embeddings is None or len(embeddings) == 0:
+            return []
+        if len(self.ids) == 0:
+            return [[] for _ in range(len(embeddings))]
+        k = min(k, self.index.ntotal)
+        mat = np.array(embeddings, dtype=np.float32)
+        mat /= np.linalg.norm(mat, axis=1, keepdims=True).clip(min=1e-12)
+        sims, labels = self.index.search(mat, k)
+        n_ids = len(self.ids)
+        return [
+            [(self.ids[i], float(1.0 - s)) for i, s in zip(row_labels, row_sims) if 0 <= i < n_ids]
+            for row_labels, row_sims in zip(labels, sims)
+        ]
+
 
 _vector_store_instance = None
 def get_vector_store():
     global _vector_store_instance
+    if _vector_store_instance is None and settings.vector_index.startswith("faiss-"):
+        _vector_store_instance = FaissSQVectorStore(
+            dim=384,
+            quantizer=settings.vector_index.split("-", 1)[1],
+            M=settings.hnsw_m,
+            ef_construction=settings.hnsw_ef_construction,
+            ef_search=settings.hnsw_ef_search,
+        )
     if _vector_store_instance is None:
-        _vector_store_instance = HNSWVectorStore(dim=384, max_elements=5000)
+        _vector_store_instance = HNSWVectorStore(
+            dim=384,
+            max_elements=5000,
+            M=settings.hnsw_m,
+            ef_construction=settings.hnsw_ef_construction,
+            ef_search=settings.hnsw_ef_search,
+        )
     return _vector_store_instance
@@ -5,15 +5,34 @@ Supports BOTH:
 - FULL MODE → transcripts + video statistics
 """
 
-import requests
+import asyncio
 import re
+from functools import lru_cache
 from typing import Optional, Dict, List
+from cachetools import TTLCache
 from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound, TranscriptsDisabled
 from config_settings import settings
 from utils_logger import get_logger
+from utils_helpers import get_session
 
 logger = get_logger("YouTubeAPIService")
 
+# channel / @handle / c/custom / user URLs in a single alternation
+_CHANNEL_URL_RE = re.compile(
+    r"youtube\.com/(?:"
+    r"channel/(?P<channel>UC[A-Za-z0-9_-]{22})"
+    r"|@(?P<handle>[A-Za-z0-9_-]+)"
+    r"|c/(?P<custom>[A-Za-z0-9_-]+)"
+    r"|user/(?P<user>[A-Za-z0-9_-]+))"
+)
+
+# YouTube Data API caps `id=` lookups at 50 per request
+_MAX_IDS_PER_CALL = 50
+
+# channel_id -> channel resource, bounded + expiring; channel metadata barely changes
+# within a few minutes, so retries / re-exports skip the round-trip
+_channel_cache = TTLCache(maxsize=256, ttl=600)
+
 
 class YouTubeAPIService:
     BASE_URL = "https://www.googleapis.com/youtube/v3"
@@ -23,10 +42,17 @@ class YouTubeAPIService:
         if not self.api_key:
             raise ValueError("YouTube API key missing")
 
+    async def _get_json(self, path: str, params: Dict) -> Dict:
+        session = await get_session()
+        async with session.get(f"{self.BASE_URL}/{path}", params=params) as resp:
+            return await resp.json()
+
     # ======================================================================
     # CHANNEL / HANDLE / NAME RESOLUTION
     # ======================================================================
-    def _extract_channel_id(self, identifier: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _extract_channel_id(identifier: str) -> str:
         identifier = identifier.strip()
 
         # Already UCxxxxxx
@@ -37,50 +63,41 @@ class YouTubeAPIService:
         if identifier.startswith("@"):
             return identifier
 
-        # URLs
-        patterns = {
-            "channel": r"youtube\.com/channel/([UC][A-Za-z0-9_-]{22})",
-            "handle": r"youtube\.com/@([A-Za-z0-9_-]+)",
-            "custom": r"youtube\.com/c/([A-Za-z0-9_-]+)",
-            "user": r"youtube\.com/user/([A-Za-z0-9_-]+)"
-        }
-
-        for key, pattern in patterns.items():
-            match = re.search(pattern, identifier)
-            if match:
-                extracted = match.group(1)
-                if key == "handle":
-                    return f"@{extracted}"
-                return extracted
+        # URLs (one scan; the named group that matched tells the kind)
+        match = _CHANNEL_URL_RE.search(identifier)
+        if match:
+            kind = match.lastgroup
+            extracted = match.group(kind)
+            if kind == "handle":
+                return f"@{extracted}"
+            return extracted
 
         return identifier
 
     # ======================================================================
     # SEARCH CHANNEL BY HANDLE / NAME
     # ======================================================================
-    def get_channel_by_name_or_handle(self, query: str) -> Optional[Dict]:
+    async def get_channel_by_name_or_handle(self, query: str) -> Optional[Dict]:
 
         query = self._extract_channel_id(query)
         logger.info(f"[YT] Resolving channel: {query}")
 
         # 1. Direct handle
         if query.startswith("@"):
-            url = f"{self.BASE_URL}/channels"
             params = {
                 "part": "snippet,statistics,contentDetails",
                 "forHandle": query[1:],  # remove "@"
                 "key": self.api_key,
             }
-            resp = requests.get(url, params=params).json()
+            resp = await self._get_json("channels", params)
             if resp.get("items"):
                 return resp["items"][0]
 
         # 2. Direct UCxxxxxx
         if query.startswith("UC") and len(query) >= 24:
-            return self.get_channel_details(query)
+            return await self.get_channel_details(query)
 
         # 3. Fallback search
-        url = f"{self.BASE_URL}/search"
         params = {
             "part": "snippet",
             "type": "channel",
@@ -89,53 +106,57 @@ class YouTubeAPIService:
             "key": self.api_key,
         }
 
-        resp = requests.get(url, params=params).json()
+        resp = await self._get_json("search", params)
 
         for item in resp.get("items", []):
             cid = item["id"]["channelId"]
-            return self.get_channel_details(cid)
+            return await self.get_channel_details(cid)
 
         return None
 
     # ======================================================================
     # CHANNEL DETAILS
     # ======================================================================
-    def get_channel_details(self, channel_id: str) -> Optional[Dict]:
-        url = f"{self.BASE_URL}/channels"
+    async def get_channel_details(self, channel_id: str) -> Optional[Dict]:
+        hit = _channel_cache.get(channel_id)
+        if hit is not None:
+            return hit
+
         params = {
             "part": "snippet,statistics,brandingSettings,contentDetails",
             "id": channel_id,
             "key": self.api_key,
         }
-        resp = requests.get(url, params=params).json()
+        resp = await self._get_json("channels", params)
         items = resp.get("items", [])
-        return items[0] if items else None
+        if not items:
+            return None
+        _channel_cache[channel_id] = items[0]
+        return items[0]
 
     # ======================================================================
-    # UPLOADS PLAYLIST
+    # UPLOADS PLAYLIST (read from the channel's contentDetails, no extra call)
     # ======================================================================
-    def _get_uploads_playlist(self, channel_id: str) -> Optional[str]:
-        url = f"{self.BASE_URL}/channels"
-        params = {
-            "part": "contentDetails",
-            "id": channel_id,
-            "key": self.api_key,
-        }
-        resp = requests.get(url, params=params).json()
-        items = resp.get("items", [])
-        if not items:
+    @staticmethod
+    def _uploads_playlist(channel: Optional[Dict]) -> Optional[str]:
+        if not channel:
             return None
-        return items[0]["contentDetails"]["relatedPlaylists"]["uploads"]
+        return channel.get("contentDetails", {}).get("relatedPlaylists", {}).get("uploads")
 
     # ======================================================================
     # FAST MODE → METADATA ONLY
     # ======================================================================
-    def get_channel_videos(self, channel_id: str, max_results: int = 25) -> List[Dict]:
-        playlist_id = self._get_uploads_playlist(channel_id)
+    async def get_channel_videos(self, channel_id: str, max_results: int = 25, channel: Optional[Dict] = None) -> List[Dict]:
+        """
+        `channel`: an already-fetched channel resource (its contentDetails carries the
+        uploads playlist). Omit it and the channel details are fetched once.
+        """
+        if channel is None:
+            channel = await self.get_channel_details(channel_id)
+        playlist_id = self._uploads_playlist(channel)
         if not playlist_id:
             return []
 
-        url = f"{self.BASE_URL}/playlistItems"
         params = {
             "part": "snippet,contentDetails",
             "playlistId": playlist_id,
@@ -143,7 +164,7 @@ class YouTubeAPIService:
             "key": self.api_key,
         }
 
-        resp = requests.get(url, params=params).json()
+        resp = await self._get_json("playlistItems", params)
         items = resp.get("items", [])
 
         videos = []
@@ -161,27 +182,29 @@ class YouTubeAPIService:
     # ======================================================================
     # FULL MODE → VIDEO STATISTICS
     # ======================================================================
-    def get_video_details(self, video_ids: List[str]) -> Dict[str, Dict]:
+    async def get_video_details(self, video_ids: List[str]) -> Dict[str, Dict]:
         """
         Returns: {video_id: {statistics + snippet}}
+        IDs are requested in chunks of 50 (API cap), all chunks concurrently.
         """
         if not video_ids:
             return {}
 
-        url = f"{self.BASE_URL}/videos"
-        params = {
-            "part": "snippet,statistics,contentDetails",
-            "id": ",".join(video_ids),
-            "key": self.api_key,
-        }
-
-        resp = requests.get(url, params=params).json()
-        items = resp.get("items", [])
+        chunks = [video_ids[i:i + _MAX_IDS_PER_CALL] for i in range(0, len(video_ids), _MAX_IDS_PER_CALL)]
+        responses = await asyncio.gather(*(
+            self._get_json("videos", {
+                "part": "snippet,statistics,contentDetails",
+                "id": ",".join(chunk),
+                "key": self.api_key,
+            })
+            for chunk in chunks
+        ))
 
         out = {}
-        for v in items:
-            vid = v["id"]
-            out[vid] = v
+        for resp in responses:
+            for v in resp.get("items", []):
+                vid = v["id"]
+                out[vid] = v
         return out
 
     # ======================================================================
@@ -193,8 +216,7 @@ class YouTubeAPIService:
         """
         try:
             transcript = YouTubeTranscriptApi.get_transcript(video_id)
-            text = " ".join([entry["text"] for entry in transcript])
-            return text.strip()
+            return " ".join(entry["text"] for entry in transcript).strip()
         except NoTranscriptFound:
             logger.warning(f"No transcript for {video_id}")
             return None
@@ -204,3 +226,18 @@ class YouTubeAPIService:
         except Exception as e:
             logger.error(f"Transcript fetch failed for {video_id}: {e}")
             return None
+
+    async def get_transcripts_bulk(self, video_ids: List[str], concurrency: int = 10) -> Dict[str, Optional[str]]:
+        """
+        Fetch transcripts for many videos concurrently (the transcript API is sync,
+        so each fetch runs in a worker thread; at most `concurrency` in flight).
+        Returns: {video_id: transcript text or None}
+        """
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(video_id: str) -> Optional[str]:
+            async with sem:
+                return await asyncio.to_thread(self.get_video_transcript, video_id)
+
+        texts = await asyncio.gather(*(one(v) for v in video_ids))
+        return dict(zip(video_ids, texts))
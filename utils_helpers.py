@@ -1,10 +1,14 @@
 # utils_helpers.py
 import re
-import aiohttp
 from utils_logger import get_logger
 
 logger = get_logger("utils")
 
+_HANDLE_RE = re.compile(r"@([A-Za-z0-9_]+)")
+_URL_RE = re.compile(r"(https?://[^\s]+)")
+_URL_HANDLE_RE = re.compile(r"/@([A-Za-z0-9_\-\.]+)")
+_URL_CHANNEL_RE = re.compile(r"/channel/([A-Za-z0-9_-]+)")
+
 
 def extract_channel_from_text(text: str) -> str:
     """Extract handle, channel id or short name from user input."""
@@ -13,35 +17,55 @@ def extract_channel_from_text(text: str) -> str:
 
     text = text.strip()
 
+    # Each regex is gated by a literal substring check (a C-level memchr-style scan),
+    # so plain channel names never enter the regex engine. If this ever runs on
+    # large, hot inputs, a multi-pattern DFA (e.g. hyperscan) over the same
+    # patterns is the next step.
+
     # handle
-    m = re.search(r"@([A-Za-z0-9_]+)", text)
-    if m:
-        handle = f"@{m.group(1)}"
-        logger.info(f"extract_channel_from_text → handle={handle}")
-        return handle
+    if "@" in text:
+        m = _HANDLE_RE.search(text)
+        if m:
+            handle = f"@{m.group(1)}"
+            logger.info(f"extract_channel_from_text → handle={handle}")
+            return handle
 
     # url
-    url_m = re.search(r"(https?://[^\s]+)", text)
-    if url_m:
-        url = url_m.group(1)
-        h = re.search(r"/@([A-Za-z0-9_\-\.]+)", url)
-        if h:
-            return f"@{h.group(1)}"
-        c = re.search(r"/channel/([A-Za-z0-9_-]+)", url)
-        if c:
-            return c.group(1)
-
-    # short text guess
-    words = text.split()
-    if len(words) <= 5:
-        guess = " ".join(words)
-        logger.info(f"extract_channel_from_text → guess channel name={guess}")
-        return guess
+    if "://" in text:
+        url_m = _URL_RE.search(text)
+        if url_m:
+            url = url_m.group(1)
+            if "/@" in url:
+                h = _URL_HANDLE_RE.search(url)
+                if h:
+                    return f"@{h.group(1)}"
+            if "/channel/" in url:
+                c = _URL_CHANNEL_RE.search(url)
+                if c:
+                    return c.group(1)
+
+    # short text guess (≤ 5 words; counting spaces avoids building a word list)
+    if text.count(" ") <= 4:
+        logger.info(f"extract_channel_from_text → guess channel name={text}")
+        return text
 
     logger.info("extract_channel_from_text → fallback to original text")
     return text
 
 
+_CODE_FENCE_RE = re.compile(r"```(?:json)?")
+
+
+def clean_llm_output(raw: str):
+    """Strip ```json code fences around LLM output."""
+    if not raw:
+        return raw
+    # common case: plain JSON, no fences → skip the scan-and-replace
+    if "```" not in raw:
+        return raw.strip()
+    return _CODE_FENCE_RE.sub("", raw).strip()
+
+
 async def get_transcript_or_empty(video_id: str) -> str:
     """
     FULL MODE (metadata-only) - intentionally returns empty string.
@@ -50,19 +74,43 @@ async def get_transcript_or_empty(video_id: str) -> str:
     return ""
 
 
+# one pooled aiohttp session for the whole process (fetch_json + YouTubeAPIService):
+# keep-alive TCP/TLS, cached DNS. Created lazily; aiohttp is only imported on first use.
+_session = None
+
+
+async def get_session():
+    global _session
+    if _session is None or _session.closed:
+        import aiohttp
+
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=50, ttl_dns_cache=300)
+        )
+    return _session
+
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
 async def fetch_json(url: str, params=None, headers=None, timeout=10):
     """Async GET returning JSON or None."""
     if params is None:
         params = {}
     if headers is None:
         headers = {}
+
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params, headers=headers, timeout=timeout) as resp:
-                if resp.status != 200:
-                    logger.warning(f"fetch_json failed {url} → status {resp.status}")
-                    return None
-                return await resp.json()
+        session = await get_session()
+        async with session.get(url, params=params, headers=headers, timeout=timeout) as resp:
+            if resp.status != 200:
+                logger.warning(f"fetch_json failed {url} → status {resp.status}")
+                return None
+            return await resp.json()
     except Exception as e:
         logger.error(f"fetch_json error for {url}: {e}")
         return None
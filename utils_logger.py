@@ -1,5 +1,8 @@
 import logging
+import os
 import sys
+import time
+import orjson
 from pathlib import Path
 from datetime import datetime
 
@@ -12,6 +15,41 @@ try:
 except:
     pass
 
+class CachedTimeFormatter(logging.Formatter):
+    """Same output as logging.Formatter, but strftime runs at most once per second."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (second, formatted) kept as one tuple: shared by handlers on different threads,
+        # so it is read and replaced atomically rather than as two separate attributes
+        self._last = (None, "")
+
+    def formatTime(self, record, datefmt=None):
+        sec = int(record.created)
+        last_sec, last_str = self._last
+        if sec != last_sec:
+            last_str = time.strftime(datefmt or self.default_time_format, self.converter(record.created))
+            self._last = (sec, last_str)
+        if datefmt:
+            return last_str
+        return self.default_msec_format % (last_str, record.msecs)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record (LOG_FORMAT=json); no %-style formatting."""
+
+    def format(self, record):
+        entry = {
+            "ts": record.created,
+            "lvl": record.levelname,
+            "name": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry).decode("utf-8")
+
+
 def setup_root_logger(level="INFO"):
     root = logging.getLogger()
     if root.handlers:
@@ -21,7 +59,10 @@ def setup_root_logger(level="INFO"):
     fh = logging.FileHandler(LOG_DIR / f"log_{datetime.now().date()}.txt", encoding="utf-8")
     ch = logging.StreamHandler(sys.stdout)
 
-    fmt = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        fmt = JsonFormatter()
+    else:
+        fmt = CachedTimeFormatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
     fh.setFormatter(fmt)
     ch.setFormatter(fmt)
 